@@ -1,4 +1,8 @@
+import functools
 import random
+import types
+
+import numpy as np
 
 
 class Minesweeper:
@@ -11,23 +15,26 @@ class Minesweeper:
         # Set initial width, height, and number of mines
         self.height = height
         self.width = width
-        self.mines = set()
 
         # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+        self.board = np.zeros((height, width), dtype=np.uint8)
 
         # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        flat = random.sample(range(height * width), mines)
+        self.board.flat[flat] = 1
+        self.mines = {divmod(k, width) for k in flat}
+
+        # Count the mines around every cell at once, by summing the
+        # zero-padded board shifted over each of the 3x3 offsets
+        padded = np.pad(self.board, 1)
+        self._nearby = (
+            sum(
+                padded[di : di + height, dj : dj + width]
+                for di in range(3)
+                for dj in range(3)
+            )
+            - self.board
+        )
 
         # At first, player has found no mines
         self.mines_found = set()
@@ -37,19 +44,15 @@ class Minesweeper:
         Prints a text-based representation
         of where mines are located.
         """
-        for i in range(self.height):
-            print("--" * self.width + "-")
-            for j in range(self.width):
-                if self.board[i][j]:
-                    print("|X", end="")
-                else:
-                    print("| ", end="")
-            print("|")
-        print("--" * self.width + "-")
+        sep = "--" * self.width + "-\n"
+        rows = [
+            sep + "".join("|X" if c else "| " for c in row) + "|\n"
+            for row in self.board
+        ]
+        print("".join(rows) + sep, end="")
 
     def is_mine(self, cell):
-        i, j = cell
-        return self.board[i][j]
+        return bool(self.board[cell])
 
     def nearby_mines(self, cell):
         """
@@ -57,24 +60,7 @@ class Minesweeper:
         within one row and column of a given cell,
         not including the cell itself.
         """
-
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+        return int(self._nearby[cell])
 
     def won(self):
         """
@@ -88,52 +74,160 @@ class Sentence:
     Logical statement about a Minesweeper game
     A sentence consists of a set of board cells,
     and a count of the number of those cells which are mines.
+
+    Cells are stored as a bitmask, with bit `i * width + j` set
+    when cell (i, j) is part of the sentence, so `width` must be
+    the width of the board the cells belong to.
     """
 
-    def __init__(self, cells, count):
-        self.cells = set(cells)
+    def __init__(self, cells, count, width):
+        self.width = width
+        if isinstance(cells, int):
+            self.cells = cells
+        else:
+            self.cells = 0
+            for cell in cells:
+                self.cells |= self._bit(cell)
         self.count = count
 
+        # Known mines and safes are worked out lazily, see _refresh
+        self._dirty = True
+
     def __eq__(self, other):
-        return self.cells == other.cells and self.count == other.count
+        return self.count == other.count and self.cells == other.cells
+
+    def __contains__(self, cell):
+        i, j = cell
+        if i < 0 or not 0 <= j < self.width:
+            return False
+        return bool(self.cells >> (i * self.width + j) & 1)
+
+    def __len__(self):
+        return bin(self.cells).count("1")
 
     def __str__(self):
-        return f"{self.cells} = {self.count}"
+        return f"{self.to_cells()} = {self.count}"
+
+    def _bit(self, cell):
+        i, j = cell
+        if not 0 <= j < self.width:
+            raise ValueError(f"column {j} is outside a board of width {self.width}")
+        return 1 << (i * self.width + j)
+
+    def to_cells(self):
+        """
+        Returns the cells of the sentence as a set of (i, j) tuples.
+        """
+        cells = set()
+        bits = self.cells
+        while bits:
+            low = bits & -bits
+            cells.add(divmod(low.bit_length() - 1, self.width))
+            bits ^= low
+        return cells
+
+    def _refresh(self):
+        """
+        Recomputes the known mines and safes if the sentence
+        has changed since they were last worked out.
+        """
+        if not self._dirty:
+            return
+        self._known_mines = self._known_safes = frozenset()
+        n = len(self)
+        if n == self.count or self.count == 0:
+            cells = frozenset(self.to_cells())
+            if n == self.count:
+                self._known_mines = cells
+            if self.count == 0:
+                self._known_safes = cells
+        self._dirty = False
 
     def known_mines(self):
         """
         Returns the set of all cells in self.cells known to be mines.
+        The set is a snapshot, so it is safe to mark cells while iterating it.
         """
-        if len(self.cells) == self.count:
-            return self.cells
-        else:
-            return set()
+        self._refresh()
+        return self._known_mines
 
     def known_safes(self):
         """
         Returns the set of all cells in self.cells known to be safe.
+        The set is a snapshot, so it is safe to mark cells while iterating it.
         """
-        if self.count == 0:
-            return self.cells
-        else:
-            return set()
+        self._refresh()
+        return self._known_safes
 
     def mark_mine(self, cell):
         """
         Updates internal knowledge representation given the fact that
         a cell is known to be a mine.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
+        bit = self._bit(cell)
+        if self.cells & bit:
+            self.cells &= ~bit
             self.count -= 1
+            self._dirty = True
 
     def mark_safe(self, cell):
         """
         Updates internal knowledge representation given the fact that
         a cell is known to be safe.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
+        bit = self._bit(cell)
+        if self.cells & bit:
+            self.cells &= ~bit
+            self._dirty = True
+
+
+@functools.lru_cache(maxsize=None)
+def _neighbor_table(height, width):
+    """
+    Returns a read-only mapping from every cell of a `height` x `width` board
+    to the frozenset of its in-bounds neighbors, not including the cell itself.
+    Tables are built once per board size and shared between AIs.
+    """
+    return types.MappingProxyType(
+        {
+            (i, j): frozenset(
+                (i + di, j + dj)
+                for di in (-1, 0, 1)
+                for dj in (-1, 0, 1)
+                if (di or dj) and 0 <= i + di < height and 0 <= j + dj < width
+            )
+            for i in range(height)
+            for j in range(width)
+        }
+    )
+
+
+def _condense(cells, counts, new):
+    """
+    Takes the sentence at index `new` out of every sentence it is a strict
+    subset of, and every strict subset of it out of it, until no such pair
+    is left. `cells` and `counts` are parallel lists of bitmasks and mine
+    counts, updated in place. Returns the indices of the sentences changed.
+    """
+    changed = set()
+    dirty = True
+    while dirty and cells[new]:
+        dirty = False
+        for i in range(len(cells)):
+            if i == new or not cells[i]:
+                continue
+            overlap = cells[i] & cells[new]
+            if overlap == cells[new] != cells[i]:
+                cells[i] &= ~cells[new]
+                counts[i] -= counts[new]
+                changed.add(i)
+                dirty = True
+            elif overlap == cells[i] != cells[new]:
+                cells[new] &= ~cells[i]
+                counts[new] -= counts[i]
+                changed.add(new)
+                dirty = True
+    return changed
 
 
 class MinesweeperAI:
@@ -154,8 +248,23 @@ class MinesweeperAI:
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Safe cells that have not been chosen yet
+        self._unplayed_safes = set()
+
+        # Cells neither chosen yet nor known to be mines
+        self._available = np.ones((height, width), dtype=bool)
+
+        # Sentences about the game known to be true, keyed by sentence id
+        self.knowledge = {}
+
+        # Sentences each cell appears in, keyed by sentence id
+        self._cell_to_sentences = {}
+
+        # Cells that appear in some sentence, mirroring the cell index keys
+        self._frontier = np.zeros((height, width), dtype=bool)
+
+        # In-bounds neighbors of every cell, not including the cell itself
+        self._neighbors = _neighbor_table(height, width)
 
     def mark_mine(self, cell):
         """
@@ -163,7 +272,9 @@ class MinesweeperAI:
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
+        self._available[cell] = False
+        self._frontier[cell] = False
+        for sentence in self._cell_to_sentences.pop(cell, {}).values():
             sentence.mark_mine(cell)
 
     def mark_safe(self, cell):
@@ -172,9 +283,46 @@ class MinesweeperAI:
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        for sentence in self.knowledge:
+        if cell not in self.moves_made:
+            self._unplayed_safes.add(cell)
+        self._frontier[cell] = False
+        for sentence in self._cell_to_sentences.pop(cell, {}).values():
             sentence.mark_safe(cell)
 
+    def _add_sentence(self, sentence):
+        """
+        Adds `sentence` to the knowledge base and records it
+        under each of its cells. Returns False, without adding it,
+        if it has no cells or an equal sentence is already known.
+        """
+        cells = sentence.to_cells()
+        if not cells:
+            return False
+
+        # Any equal sentence shares all of its cells, so one entry is enough
+        known = self._cell_to_sentences.get(next(iter(cells)), {})
+        if any(other == sentence for other in known.values()):
+            return False
+
+        self.knowledge[id(sentence)] = sentence
+        for cell in cells:
+            self._cell_to_sentences.setdefault(cell, {})[id(sentence)] = sentence
+            self._frontier[cell] = True
+        return True
+
+    def _remove_sentence(self, sentence):
+        """
+        Removes `sentence` from the knowledge base and from
+        the entries of each of its cells.
+        """
+        del self.knowledge[id(sentence)]
+        for cell in sentence.to_cells():
+            known = self._cell_to_sentences[cell]
+            known.pop(id(sentence), None)
+            if not known:
+                del self._cell_to_sentences[cell]
+                self._frontier[cell] = False
+
     def add_knowledge(self, cell, count):
         """
         Called when the Minesweeper board tells us, for a given
@@ -192,102 +340,48 @@ class MinesweeperAI:
         """
         # Marks move as made
         self.moves_made.add(cell)
-
-        # Adding to safe cells
-        if cell not in self.safes:
-            self.mark_safe(cell)
-
-        # Updating any sentence with the new safe cell
-        if len(self.knowledge) > 1:
-            for sentence in self.knowledge:
-                if cell in sentence.cells:
-                    sentence.mark_safe(cell)
-        elif len(self.knowledge) == 1:
-            if cell in self.knowledge[0].cells:
-                self.knowledge[0].mark_safe(cell)
-
-        # Adding new knowledge
-        x, y = cell
-        cells_to_add_to_sentence = set()
-        for i in range(-1, 2):
-            for j in range(-1, 2):
-                if x + i >= 0 and y + j >= 0 and x + i <= 7 and y + j <= 7:
-                    if i != 0 or j != 0 and not ((x + i, y + j) in self.moves_made):
-                        cells_to_add_to_sentence.add((x + i, y + j))
-
-        new_sentence = Sentence(cells_to_add_to_sentence, count)
-        self.knowledge.append(new_sentence)
-
-        for sentence in self.knowledge:
-            if len(sentence.cells) == 0:
-                self.knowledge.remove(sentence)
-            safe_cells = list(sentence.known_safes())
-            mine_cells = list(sentence.known_mines())
-            for safe in safe_cells:
+        self._unplayed_safes.discard(cell)
+        self._available[cell] = False
+
+        # Adding to safe cells, which also updates any sentence containing it
+        self.mark_safe(cell)
+
+        # Adding new knowledge, leaving out cells already known
+        neighbors = self._neighbors[cell]
+        cells_to_add_to_sentence = neighbors - self.moves_made - self.safes - self.mines
+        count -= len(neighbors & self.mines)
+
+        new_sentence = Sentence(cells_to_add_to_sentence, count, self.width)
+
+        # Condensing the new sentence (inserted last) against each existing
+        # one, working on the raw bitmasks and only building sentences for
+        # the ones that changed
+        if self._add_sentence(new_sentence):
+            sentences = list(self.knowledge.values())
+            cells = [sentence.cells for sentence in sentences]
+            counts = [sentence.count for sentence in sentences]
+            for i in _condense(cells, counts, len(sentences) - 1):
+                condensed = Sentence(cells[i], counts[i], self.width)
+                self._remove_sentence(sentences[i])
+                self._add_sentence(condensed)
+
+        # Marking any cells the sentences now pin down
+        for sentence in self.knowledge.values():
+            for safe in sentence.known_safes():
                 self.mark_safe(safe)
-            for mine in mine_cells:
+            for mine in sentence.known_mines():
                 self.mark_mine(mine)
 
-        condensed_data = []
-        data_to_be_removed = []
-
-        # Updating/Condensing sets
-        for sentence in self.knowledge:
-            if len(sentence.cells) == 0:
-                self.knowledge.remove(sentence)
-            elif len(sentence.cells) == len(new_sentence.cells):
-                continue
-            elif new_sentence.cells.issubset(sentence.cells):
-                data_to_be_removed.append(new_sentence)
-                data_to_be_removed.append(sentence)
-                condensed_data.append(
-                    Sentence(
-                        sentence.cells - new_sentence.cells,
-                        sentence.count - new_sentence.count,
-                    )
-                )
-            elif sentence.cells.issubset(new_sentence.cells):
-                data_to_be_removed.append(new_sentence)
-                data_to_be_removed.append(sentence)
-                condensed_data.append(
-                    Sentence(
-                        new_sentence.cells - sentence.cells,
-                        new_sentence.count - sentence.count,
-                    )
-                )
-            else:
-                to_be_removed = []
-                for cell in sentence.cells:
-                    if cell in self.moves_made:
-                        to_be_removed.append(cell)
-                for cell in to_be_removed:
-                    sentence.cells.remove(cell)
-
-        # Adding new conclusion to knowledge base
-        if len(data_to_be_removed) > 1:
-            for sentence in data_to_be_removed:
-                if sentence in self.knowledge:
-                    self.knowledge.remove(sentence)
-        elif len(data_to_be_removed) == 1:
-            if sentence in self.knowledge:
-                self.knowledge.remove(data_to_be_removed[0])
-        if len(condensed_data) > 1:
-            for sentence in condensed_data:
-                if not sentence in self.knowledge:
-                    self.knowledge.append(sentence)
-        elif len(condensed_data) == 1:
-            if not sentence in self.knowledge:
-                self.knowledge.append(condensed_data[0])
+        # Dropping sentences left with no cells (none are in the cell index)
+        self.knowledge = {
+            key: sentence for key, sentence in self.knowledge.items() if sentence.cells
+        }
 
     def make_safe_move(self):
         """
         Returns a safe cell to choose on the Minesweeper board.
         """
-        if len(self.safes) == 0:
-            return None
-        for move in self.safes:
-            if not move in self.moves_made:
-                return move
+        return next(iter(self._unplayed_safes), None)
 
     def make_random_move(self):
         """
@@ -295,29 +389,11 @@ class MinesweeperAI:
         Should choose randomly among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+        Cells that are not part of any sentence are preferred.
         """
-        board = set()
-
-        for i in range(8):
-            for j in range(8):
-                board.add((i, j))
-
-        for move in self.moves_made:
-            board.remove(move)
-
-        possible_moves = []
-
-        for move in board:
-            if not move in self.mines:
-                possible_moves.append(move)
-
-        for move in possible_moves:
-            for sentence in self.knowledge:
-                if not move in sentence.cells:
-                    return move
-        if len(possible_moves) != 1 and len(possible_moves) != 0:
-            return possible_moves[random.randint(0, len(possible_moves) - 1)]
-        elif len(possible_moves) == 0:
-            return None
-        else:
-            possible_moves[0]
+        moves = np.flatnonzero(self._available & ~self._frontier)
+        if moves.size == 0:
+            moves = np.flatnonzero(self._available)
+            if moves.size == 0:
+                return None
+        return divmod(int(random.choice(moves)), self.width)